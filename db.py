@@ -1,70 +1,121 @@
 import sqlite3
+import threading
+
+# Одно соединение на файл БД вместо connect/close на каждый вызов
+_CONNS = {}
+_CONNS_LOCK = threading.Lock()
+_WRITE_LOCK = threading.Lock()
+# Кэш чёрного списка по пути к БД, сбрасывается в add_blacklist
+_BLACKLIST_CACHE = {}
+
+def _get_conn(path="data.db"):
+    conn = _CONNS.get(path)
+    if conn is None:
+        with _CONNS_LOCK:
+            conn = _CONNS.get(path)
+            if conn is None:
+                conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA temp_store=MEMORY")
+                _CONNS[path] = conn
+    return conn
 
 def init_db(path="data.db"):
-    conn = sqlite3.connect(path)
-    c = conn.cursor()
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS donors (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE
-    )
-    """)
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS blacklist (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        phrase TEXT UNIQUE
-    )
-    """)
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS config (
-        key TEXT PRIMARY KEY,
-        value TEXT
-    )
-    """)
-    conn.commit()
-    conn.close()
+    conn = _get_conn(path)
+    with _WRITE_LOCK:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS donors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS blacklist (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phrase TEXT UNIQUE
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS config (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        """)
+        _lowercase_blacklist(conn)
+    _BLACKLIST_CACHE.pop(path, None)
+
+def _lowercase_blacklist(conn):
+    """Фразы хранятся в нижнем регистре, приводим старые записи.
+
+    Делаем это в Python: lower() в SQLite понимает только ASCII."""
+    rows = conn.execute("SELECT id, phrase FROM blacklist ORDER BY id").fetchall()
+    kept = {phrase for _, phrase in rows if phrase is not None and phrase == phrase.lower()}
+    conn.execute("BEGIN")
+    try:
+        for row_id, phrase in rows:
+            if phrase is None or phrase == phrase.lower():
+                continue
+            lowered = phrase.lower()
+            if lowered in kept:
+                # Такая фраза в нижнем регистре уже есть, дубль не нужен
+                conn.execute("DELETE FROM blacklist WHERE id=?", (row_id,))
+            else:
+                conn.execute("UPDATE blacklist SET phrase=? WHERE id=?", (lowered, row_id))
+                kept.add(lowered)
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
 
 def add_donor(username, path="data.db"):
-    conn = sqlite3.connect(path)
-    c = conn.cursor()
-    c.execute("INSERT OR IGNORE INTO donors(username) VALUES(?)", (username,))
-    conn.commit()
-    conn.close()
+    with _WRITE_LOCK:
+        _get_conn(path).execute("INSERT OR IGNORE INTO donors(username) VALUES(?)", (username,))
+
+def add_donors(usernames, path="data.db"):
+    conn = _get_conn(path)
+    with _WRITE_LOCK:
+        # Одна транзакция на всю пачку вместо коммита на каждую строку
+        conn.execute("BEGIN")
+        try:
+            conn.executemany("INSERT OR IGNORE INTO donors(username) VALUES(?)", ((u,) for u in usernames))
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
 
 def get_donors(path="data.db"):
-    conn = sqlite3.connect(path)
-    c = conn.cursor()
-    c.execute("SELECT username FROM donors")
-    rows = c.fetchall()
-    conn.close()
+    rows = _get_conn(path).execute("SELECT username FROM donors").fetchall()
     return [r[0] for r in rows]
 
 def add_blacklist(phrase, path="data.db"):
-    conn = sqlite3.connect(path)
-    c = conn.cursor()
-    c.execute("INSERT OR IGNORE INTO blacklist(phrase) VALUES(?)", (phrase,))
-    conn.commit()
-    conn.close()
+    with _WRITE_LOCK:
+        _get_conn(path).execute("INSERT OR IGNORE INTO blacklist(phrase) VALUES(?)", (phrase.lower(),))
+        _BLACKLIST_CACHE.pop(path, None)
+
+def add_blacklist_phrases(phrases, path="data.db"):
+    conn = _get_conn(path)
+    with _WRITE_LOCK:
+        conn.execute("BEGIN")
+        try:
+            conn.executemany("INSERT OR IGNORE INTO blacklist(phrase) VALUES(?)", ((p.lower(),) for p in phrases))
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        _BLACKLIST_CACHE.pop(path, None)
 
 def get_blacklist(path="data.db"):
-    conn = sqlite3.connect(path)
-    c = conn.cursor()
-    c.execute("SELECT phrase FROM blacklist")
-    rows = c.fetchall()
-    conn.close()
-    return [r[0].lower() for r in rows]
+    cached = _BLACKLIST_CACHE.get(path)
+    if cached is None:
+        rows = _get_conn(path).execute("SELECT phrase FROM blacklist").fetchall()
+        cached = _BLACKLIST_CACHE[path] = tuple(r[0] for r in rows)
+    return cached
 
 def set_config(key, value, path="data.db"):
-    conn = sqlite3.connect(path)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO config(key,value) VALUES(?,?)", (key, value))
-    conn.commit()
-    conn.close()
+    with _WRITE_LOCK:
+        _get_conn(path).execute("INSERT OR REPLACE INTO config(key,value) VALUES(?,?)", (key, value))
 
 def get_config(key, path="data.db"):
-    conn = sqlite3.connect(path)
-    c = conn.cursor()
-    c.execute("SELECT value FROM config WHERE key=?", (key,))
-    row = c.fetchone()
-    conn.close()
+    row = _get_conn(path).execute("SELECT value FROM config WHERE key=?", (key,)).fetchone()
     return row[0] if row else None
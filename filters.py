@@ -1,19 +1,42 @@
+# Модуль собирается mypyc, см. setup.py: держите аннотации точными
 import re
+from functools import lru_cache
+from typing import Optional, Pattern, Sequence, Tuple
 
-def clean_text(text: str, blacklist: list, signature: str = None) -> str:
+_URL_RE = re.compile(r'http\S+|t\.me/\S+')
+_MENTION_RE = re.compile(r'@\w+')
+_WS_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=8)
+def _compile_blacklist(phrases: Tuple[str, ...]) -> Pattern[str]:
+    # одна альтернация вместо отдельного re.sub на каждую фразу
+    return re.compile('|'.join(re.escape(p) for p in phrases), re.IGNORECASE)
+
+
+def contains_keywords(text: str, pattern: Optional[Pattern[str]]) -> bool:
+    if not text or pattern is None:
+        return False
+    return pattern.search(text) is not None
+
+
+def clean_text(text: str, blacklist: Sequence[str], signature: Optional[str] = None) -> str:
     if not text:
         return ""
 
-    # убираем ссылки
-    text = re.sub(r'http\S+|t\.me/\S+', '', text)
+    # убираем ссылки (проверка через in дешевле запуска регулярки)
+    if 'http' in text or 't.me/' in text:
+        text = _URL_RE.sub('', text)
     # убираем упоминания
-    text = re.sub(r'@\w+', '', text)
+    if '@' in text:
+        text = _MENTION_RE.sub('', text)
 
     # убираем фразы из чёрного списка
-    for phrase in blacklist:
-        text = re.sub(re.escape(phrase), '', text, flags=re.IGNORECASE)
+    phrases = tuple(p for p in blacklist if p)
+    if phrases:
+        text = _compile_blacklist(phrases).sub('', text)
 
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = _WS_RE.sub(' ', text).strip()
 
     if signature:
         text += f"\n\n{signature}"
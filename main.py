@@ -1,19 +1,33 @@
 import asyncio
+import codecs
+import contextlib
 import logging
-import json
+import io
 import os
 import hashlib
-from typing import Dict, List, Set
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import orjson
 from dotenv import load_dotenv
 from telethon import TelegramClient, errors
-from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
+from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument, MessageMediaWebPage, MessageMediaPoll
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder 
-from bs4 import BeautifulSoup
+from pybloom_live import ScalableBloomFilter
+from blake3 import blake3
+from filters import contains_keywords
 import aiohttp
 import re 
+from lxml import etree
+
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    # uvloop нет под Windows, тогда работаем на стандартном цикле
+    pass
 
 # ================= Configuration =================
 load_dotenv()
@@ -28,48 +42,303 @@ API_ID = int(os.getenv("API_ID"))
 API_HASH = os.getenv("API_HASH")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 CONFIG_FILE = "config.json"
+SENT_BLOOM_FILE = "sent_hashes.b3.bloom"
+PREV_SENT_BLOOM_FILE = "sent_hashes.b3.prev.bloom"
+# После стольких хэшей текущий фильтр становится предыдущим поколением,
+# а самое старое поколение выбрасывается
+SENT_BLOOM_CAPACITY = 100_000
+# Новые хэши дописываются в лог, снимок фильтра перезаписывается только
+# когда в логе набирается SENT_LOG_COMPACT_AT записей
+SENT_LOG_FILE = "sent_hashes.log"
+SENT_LOG_COMPACT_AT = 10_000
+# Фильтр с MD5-хэшами, сохранёнными до перехода на BLAKE3 (только чтение).
+# Проверяется только первые LEGACY_MD5_MAX_AGE секунд после перехода, пока
+# свежие сообщения источников ещё могут совпасть со старыми отправками
+LEGACY_MD5_BLOOM_FILE = "sent_hashes.bloom"
+LEGACY_MD5_MAX_AGE = 3 * 24 * 3600
+CONFIG_FLUSH_INTERVAL = 2  # секунды между записями конфига на диск
+SITES_CONCURRENCY = 10  # сколько сайтов парсим одновременно
+KEYWORDS_TRIGGERS = ("ключевые слова", "keywords")
+# Страницу читаем кусками и останавливаемся, набрав столько символов текста
+SITE_CHUNK_SIZE = 4096
+SITE_TEXT_LIMIT = 2000
+
+# Регулярки для remove_hyperlinks компилируются один раз
+_MD_LINK_RE = re.compile(r'\[([^\]]+)\]\([^\)]+\)')
+_HTML_A_RE = re.compile(r'<a\s+href="[^"]+">([^<]+)</a>')
+_HTTP_RE = re.compile(r'https?://\S+')
 
 # ================= Data Structures =================
 class Config:
     def __init__(self):
         self.sources: Dict[str, List[str]] = {"channels": [], "sites": []}
-        self.keywords: List[str] = []
+        self._source_by_hash: Dict[str, Tuple[str, str]] = {}
+        self.keywords = []
         self.target_channel: str = None
-        self.sent_hashes: Set[str] = set()
+        self.sent_bloom = self._new_bloom()
+        self.prev_sent_bloom: Optional[ScalableBloomFilter] = None
+        self.legacy_bloom: Optional[ScalableBloomFilter] = None
+        self._legacy_expires_at = 0.0
+        self._dirty = False
+        self._rotated = False
+        self._drop_legacy_file = False
+        self._pending_hashes: List[str] = []
+        self._log_entries = 0
+        self._save_lock = asyncio.Lock()
         self.load()
 
+    @property
+    def keywords(self) -> List[str]:
+        return self._keywords
+
+    @keywords.setter
+    def keywords(self, value: List[str]):
+        """При смене ключевых слов пересобирает общую регулярку для поиска"""
+        self._keywords = value
+        self.keywords_pattern: Optional[re.Pattern] = (
+            re.compile('|'.join(map(re.escape, value)), re.IGNORECASE) if value else None
+        )
+
+    @staticmethod
+    def _new_bloom() -> ScalableBloomFilter:
+        return ScalableBloomFilter(initial_capacity=SENT_BLOOM_CAPACITY, error_rate=1e-4)
+
     def clean_sources(self):
         """Удаляет целевой канал из источников"""
         if self.target_channel and self.target_channel in self.sources['channels']:
             self.sources['channels'].remove(self.target_channel)
+            self._source_by_hash.pop(self.source_hash(self.target_channel), None)
+
+    @staticmethod
+    def source_hash(source: str) -> str:
+        """Короткий идентификатор источника для callback_data"""
+        return hashlib.md5(source.encode()).hexdigest()
+
+    def _index_sources(self):
+        self._source_by_hash = {
+            self.source_hash(source): (source_type, source)
+            for source_type, sources in self.sources.items()
+            for source in sources
+        }
+
+    def add_source(self, source_type: str, source: str):
+        self.sources[source_type].append(source)
+        self._source_by_hash[self.source_hash(source)] = (source_type, source)
+
+    def pop_source(self, source_hash: str) -> Optional[Tuple[str, str]]:
+        """Удаляет источник по хэшу, возвращает (тип, источник) или None"""
+        entry = self._source_by_hash.pop(source_hash, None)
+        if entry:
+            source_type, source = entry
+            self.sources[source_type].remove(source)
+        return entry
 
     def load(self):
         try:
-            with open(CONFIG_FILE, "r") as f:
-                data = json.load(f)
+            with open(CONFIG_FILE, "rb") as f:
+                data = orjson.loads(f.read())
                 self.sources = data.get("sources", {"channels": [], "sites": []})
                 self.keywords = data.get("keywords", [])
                 self.target_channel = data.get("target_channel")
-                self.sent_hashes = set(data.get("sent_hashes", []))
+                legacy_hashes = data.get("sent_hashes", [])
+                self._index_sources()
                 self.clean_sources()
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+        except (FileNotFoundError, orjson.JSONDecodeError) as e:
             logger.warning(f"Config load error: {e}, using defaults")
+            legacy_hashes = []
+
+        self.sent_bloom = self._load_bloom(SENT_BLOOM_FILE)
+        if self.sent_bloom is None:
+            self.sent_bloom = self._new_bloom()
+        self.prev_sent_bloom = self._load_bloom(PREV_SENT_BLOOM_FILE)
+        self.legacy_bloom = self._load_bloom(LEGACY_MD5_BLOOM_FILE)
+        self._replay_sent_log()
+
+        # Переносим старые hex MD5-хэши из config.json в legacy-фильтр
+        if legacy_hashes:
+            if self.legacy_bloom is None:
+                self.legacy_bloom = self._new_bloom()
+            for h in legacy_hashes:
+                if self._is_hash_hex(h):
+                    self.legacy_bloom.add(h.lower())
+            with open(LEGACY_MD5_BLOOM_FILE, "wb") as f:
+                self.legacy_bloom.tofile(f)
+            # Следующая запись уберёт список из config.json, иначе он
+            # переносился бы заново при каждом запуске
+            self.mark_dirty()
+
+        if self.legacy_bloom is not None:
+            self._legacy_expires_at = os.path.getmtime(LEGACY_MD5_BLOOM_FILE) + LEGACY_MD5_MAX_AGE
+            if time.time() >= self._legacy_expires_at:
+                self._drop_legacy_bloom()
+
+    @staticmethod
+    def _is_hash_hex(value) -> bool:
+        if not isinstance(value, str) or len(value) != 32:
+            return False
+        try:
+            bytes.fromhex(value)
+        except ValueError:
+            return False
+        return True
+
+    def _drop_legacy_bloom(self):
+        self.legacy_bloom = None
+        self._drop_legacy_file = True
+
+    @staticmethod
+    def _load_bloom(path: str) -> Optional[ScalableBloomFilter]:
+        try:
+            with open(path, "rb") as f:
+                return ScalableBloomFilter.fromfile(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Bloom filter load error ({path}): {e}, ignoring")
+            return None
+
+    def _replay_sent_log(self):
+        """Досыпает в фильтр хэши, записанные после последнего снимка"""
+        try:
+            with open(SENT_LOG_FILE, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    # Недописанные строки после аварийного завершения пропускаем
+                    if not self._is_hash_hex(line):
+                        continue
+                    self.sent_bloom.add(line)
+                    self._log_entries += 1
+        except FileNotFoundError:
+            pass
+
+    @property
+    def sent_count(self) -> int:
+        return len(self.sent_bloom) + (len(self.prev_sent_bloom) if self.prev_sent_bloom is not None else 0)
+
+    def was_sent(self, msg_hash: str, legacy_text: Callable[[], str]) -> bool:
+        """legacy_text строит строку, которую до перехода на BLAKE3 хэшировали MD5;
+        вызывается только если оба поколения фильтра не нашли хэш"""
+        if msg_hash in self.sent_bloom:
+            return True
+        if self.prev_sent_bloom is not None and msg_hash in self.prev_sent_bloom:
+            return True
+        if self.legacy_bloom is None:
+            return False
+        if time.time() >= self._legacy_expires_at:
+            self._drop_legacy_bloom()
+            return False
+        if get_legacy_message_hash(legacy_text()) not in self.legacy_bloom:
+            return False
+        # Переносим совпадение в текущий фильтр, чтобы после удаления
+        # legacy-фильтра сообщение не считалось новым
+        self.mark_sent(msg_hash)
+        return True
 
-    def save(self):
+    def mark_sent(self, msg_hash: str):
+        self.sent_bloom.add(msg_hash)
+        if len(self.sent_bloom) >= SENT_BLOOM_CAPACITY:
+            # Держим не больше двух поколений, память и размер файлов ограничены
+            self.prev_sent_bloom = self.sent_bloom
+            self.sent_bloom = self._new_bloom()
+            self._rotated = True
+            if self.legacy_bloom is not None:
+                self._drop_legacy_bloom()
+        self._pending_hashes.append(msg_hash)
+
+    def mark_dirty(self):
+        """Помечает конфиг как изменённый, запись делает config_flush_loop"""
         self.clean_sources()
-        with open(CONFIG_FILE, "w") as f:
-            json.dump({
-                "sources": self.sources,
-                "keywords": self.keywords,
-                "target_channel": self.target_channel,
-                "sent_hashes": list(self.sent_hashes)
-            }, f, indent=2)
+        self._dirty = True
+
+    async def save(self):
+        """Сразу записывает конфиг, не блокируя event loop"""
+        self.mark_dirty()
+        await self.flush()
+
+    async def flush(self):
+        """Записывает на диск конфиг и новые хэши, если они менялись с прошлой записи"""
+        async with self._save_lock:
+            if not (self._dirty or self._pending_hashes or self._rotated or self._drop_legacy_file):
+                return
+            dirty, rotated, pending = self._dirty, self._rotated, self._pending_hashes
+            drop_legacy = self._drop_legacy_file
+            self._dirty = False
+            self._rotated = False
+            self._drop_legacy_file = False
+            self._pending_hashes = []
+            compact = rotated or self._log_entries + len(pending) >= SENT_LOG_COMPACT_AT
+            # Снимок делаем в потоке event loop, чтобы не писать фильтр,
+            # который параллельно меняется
+            files = []
+            remove = [LEGACY_MD5_BLOOM_FILE] if drop_legacy else []
+            log_append = b""
+            if dirty:
+                files.append((CONFIG_FILE, orjson.dumps({
+                    "sources": self.sources,
+                    "keywords": self.keywords,
+                    "target_channel": self.target_channel
+                }, option=orjson.OPT_INDENT_2)))
+            if compact:
+                # Лог очищается после записи снимка: при сбое между ними
+                # повторное чтение лога ничего не испортит. Предыдущее поколение
+                # пишем первым, иначе сбой после записи нового пустого фильтра
+                # потеряет всё поколение
+                if rotated:
+                    files.append((PREV_SENT_BLOOM_FILE, self._bloom_bytes(self.prev_sent_bloom)))
+                files.append((SENT_BLOOM_FILE, self._bloom_bytes(self.sent_bloom)))
+                files.append((SENT_LOG_FILE, b""))
+            else:
+                log_append = "".join(h + "\n" for h in pending).encode()
+            written = False
+            write = asyncio.ensure_future(asyncio.to_thread(self._write_files, files, remove, log_append))
+            try:
+                try:
+                    await asyncio.shield(write)
+                except asyncio.CancelledError:
+                    # Поток уже пишет файлы: дожидаемся его под блокировкой,
+                    # чтобы следующий flush не писал те же *.tmp параллельно
+                    await write
+                    written = True
+                    raise
+                written = True
+            finally:
+                if written:
+                    self._log_entries = 0 if compact else self._log_entries + len(pending)
+                else:
+                    # Запись не удалась или прервана: возвращаем изменения в очередь
+                    self._dirty = self._dirty or dirty
+                    self._rotated = self._rotated or rotated
+                    self._drop_legacy_file = self._drop_legacy_file or drop_legacy
+                    self._pending_hashes = pending + self._pending_hashes
+
+    @staticmethod
+    def _bloom_bytes(bloom: ScalableBloomFilter) -> bytes:
+        buf = io.BytesIO()
+        bloom.tofile(buf)
+        return buf.getvalue()
+
+    @staticmethod
+    def _write_files(files: List[Tuple[str, bytes]], remove: List[str], log_append: bytes):
+        if log_append:
+            with open(SENT_LOG_FILE, "ab") as f:
+                f.write(log_append)
+        for path, data in files:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        for path in remove:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
 
 config = Config()
 parsing_active = False
 parsing_task = None
 awaiting_target_channel = False
 awaiting_source = False
+http_session: Optional[aiohttp.ClientSession] = None
 
 # ================= Telegram Clients =================
 userbot = TelegramClient('userbot_session', API_ID, API_HASH)
@@ -142,13 +411,31 @@ async def send_message_with_menu(chat_id: int, text: str, parse_mode=None):
 
 # ================= Parsing Utilities =================
 def get_message_hash(text: str) -> str:
+    # Фильтр Блума хэширует str(key), поэтому храним hex, а не сырые байты:
+    # repr байтов длиннее 32 hex-символов
+    return blake3(text.encode()).hexdigest()[:32]
+
+def get_legacy_message_hash(text: str) -> str:
+    """MD5-хэш, которым сообщения помечались до перехода на BLAKE3"""
     return hashlib.md5(text.encode()).hexdigest()
 
-def contains_keywords(text: str, keywords: List[str]) -> bool:
-    if not text or not keywords:
-        return False
-    text_lower = text.lower()
-    return any(kw.lower() in text_lower for kw in keywords)
+def get_media_key(media) -> str:
+    """Дешёвый идентификатор медиа для хэша вместо str(media), который печатает весь TL-объект"""
+    if media is None:
+        # Совпадает с прежним str(None), хэши текстовых сообщений не меняются
+        return "None"
+    if isinstance(media, MessageMediaPhoto) and media.photo:
+        return f"P{media.photo.id}"
+    if isinstance(media, MessageMediaDocument) and media.document:
+        return f"D{media.document.id}"
+    if isinstance(media, MessageMediaWebPage):
+        webpage_id = getattr(media.webpage, 'id', None)
+        if webpage_id is not None:
+            return f"W{webpage_id}"
+    if isinstance(media, MessageMediaPoll):
+        return f"Q{media.poll.id}"
+    # Редкие типы (гео, контакты, кубики...) различаем по полному описанию
+    return str(media)
 
 def remove_hyperlinks(text: str) -> str:
     """Удаляет гиперссылки из текста, оставляя только текст ссылки"""
@@ -156,66 +443,171 @@ def remove_hyperlinks(text: str) -> str:
         return text
     
     # Удаляем markdown ссылки [текст](url)
-    text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
+    text = _MD_LINK_RE.sub(r'\1', text)
     
     # Удаляем HTML ссылки <a href="url">текст</a>
-    text = re.sub(r'<a\s+href="[^"]+">([^<]+)</a>', r'\1', text)
+    text = _HTML_A_RE.sub(r'\1', text)
     
     # Удаляем простые URL (http://example.com)
-    text = re.sub(r'https?://\S+', '', text)
+    text = _HTTP_RE.sub('', text)
     
     return text.strip()
 
-async def parse_sites():
-    if not config.target_channel:
-        logger.warning("Target channel not set, skipping sites parsing")
-        return
+class PageTextCollector:
+    """Цель для потокового lxml-парсера: собирает видимый текст страницы,
+    пропуская script/style/nav/footer"""
+    SKIP_TAGS = frozenset(('script', 'style', 'nav', 'footer'))
 
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
-        for site in config.sources["sites"]:
-            try:
-                logger.info(f"Parsing site: {site}")
-                async with session.get(site) as resp:
-                    if resp.status != 200:
-                        logger.warning(f"Site {site} returned status {resp.status}")
-                        continue
+    def __init__(self, keywords_pattern: Optional[re.Pattern] = None):
+        self.parts: List[str] = []
+        self.length = 0
+        self.keywords_pattern = keywords_pattern
+        self.keywords_found = keywords_pattern is None
+        self._skip_depth = 0
+        self._last = ""
+        # libxml2 отдаёт текстовый узел кусками (по границам feed и
+        # сущностей), склеиваем их до ближайшего тега
+        self._run: List[str] = []
 
-                    html = await resp.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    for element in soup(['script', 'style', 'nav', 'footer']):
-                        element.decompose()
+    def start(self, tag, attrib):
+        self._flush_run()
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+
+    def end(self, tag):
+        self._flush_run()
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def data(self, data):
+        if not self._skip_depth:
+            self._run.append(data)
+
+    def close(self):
+        self._flush_run()
+        return self.text
+
+    def _flush_run(self):
+        if not self._run:
+            return
+        data = ''.join(self._run).strip()
+        self._run = []
+        if not data:
+            return
+        if not self.keywords_found:
+            # Ищем с предыдущим куском, чтобы найти фразу на стыке тегов
+            window = f"{self._last} {data}" if self._last else data
+            self.keywords_found = contains_keywords(window, self.keywords_pattern)
+        self._last = data
+        # Сверх лимита текст не храним, только ищем ключевые слова
+        if self.length < SITE_TEXT_LIMIT:
+            self.parts.append(data)
+        self.length += len(data) + 1
+
+    @property
+    def done(self) -> bool:
+        return self.length >= SITE_TEXT_LIMIT and self.keywords_found
+
+    @property
+    def text(self) -> str:
+        return ' '.join(self.parts)
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+
+def _get_decoder(charset: Optional[str], first_chunk: bytes):
+    """Строгий декодер: кодировка из заголовка, иначе из <meta charset> в начале страницы, иначе UTF-8"""
+    if not charset:
+        match = _META_CHARSET_RE.search(first_chunk)
+        charset = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        return codecs.getincrementaldecoder(charset)()
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')()
+
+async def _parse_one_site(site: str, session: aiohttp.ClientSession, sem: asyncio.Semaphore):
+    async with sem:
+        try:
+            logger.info(f"Parsing site: {site}")
+            async with session.get(site) as resp:
+                if resp.status != 200:
+                    logger.warning(f"Site {site} returned status {resp.status}")
+                    return
+
+                # Не читаем страницу целиком: хватает начала текста, а при
+                # заданных ключевых словах — до первого совпадения
+                collector = PageTextCollector(config.keywords_pattern)
+                parser = etree.HTMLParser(target=collector)
+                decoder = None
+                # Кодировку выбираем по первым SITE_CHUNK_SIZE байтам: там
+                # должен оказаться <meta charset>, даже если сеть отдаёт мелкие куски
+                head = b''
+                try:
+                    async for chunk in resp.content.iter_chunked(SITE_CHUNK_SIZE):
+                        if decoder is None:
+                            head += chunk
+                            if len(head) < SITE_CHUNK_SIZE:
+                                continue
+                            decoder = _get_decoder(resp.charset, head)
+                            chunk, head = head, b''
+                        parser.feed(decoder.decode(chunk))
+                        if collector.done:
+                            break
+                    else:
+                        if decoder is None:
+                            decoder = _get_decoder(resp.charset, head)
+                        tail = decoder.decode(head, final=True)
+                        if tail:
+                            parser.feed(tail)
+                        try:
+                            parser.close()
+                        except etree.XMLSyntaxError:
+                            # Пустой документ: ниже сработает проверка на пустой текст
+                            pass
+                except UnicodeDecodeError as e:
+                    # Лучше пропустить страницу, чем отправить в канал кракозябры
+                    logger.warning(f"Site {site} has undecodable content ({e}), skipping")
+                    return
+
+                text = collector.text
+                if not text:
+                    logger.warning(f"No text content found on {site}")
+                    return
                     
-                    text = ' '.join(soup.stripped_strings)
-                    if not text:
-                        logger.warning(f"No text content found on {site}")
-                        continue
-                        
-                    snippet = text[:1000]
-                    msg_hash = get_message_hash(snippet)
+                snippet = text[:1000]
+                msg_hash = get_message_hash(snippet)
 
-                    if msg_hash not in config.sent_hashes:
-                        if not config.keywords or contains_keywords(text, config.keywords):
-                            message_text = f"{snippet}..."
-                            if len(message_text) > 4000:
-                                message_text = message_text[:4000] + "..."
+                if not config.was_sent(msg_hash, lambda: snippet):
+                    if collector.keywords_found:
+                        message_text = f"{snippet}..."
+                        if len(message_text) > 4000:
+                            message_text = message_text[:4000] + "..."
 
-                            try:
-                                await userbot.send_message(
-                                    config.target_channel,
-                                    message_text,
-                                    link_preview=False
-                                )
-                                config.sent_hashes.add(msg_hash)
-                                config.save()
-                                logger.info(f"Successfully sent content from {site}")
-                            except errors.FloodWaitError as e:
-                                logger.error(f"Flood wait error: {e}, sleeping for {e.seconds} seconds")
-                                await asyncio.sleep(e.seconds)
-                            except Exception as e:
-                                logger.error(f"Error sending message from {site}: {e}")
-            except Exception as e:
-                logger.error(f"Error parsing site {site}: {e}")
+                        try:
+                            await userbot.send_message(
+                                config.target_channel,
+                                message_text,
+                                link_preview=False
+                            )
+                            config.mark_sent(msg_hash)
+                            logger.info(f"Successfully sent content from {site}")
+                        except errors.FloodWaitError as e:
+                            logger.error(f"Flood wait error: {e}, sleeping for {e.seconds} seconds")
+                            await asyncio.sleep(e.seconds)
+                        except Exception as e:
+                            logger.error(f"Error sending message from {site}: {e}")
+        except Exception as e:
+            logger.error(f"Error parsing site {site}: {e}")
+
+async def parse_sites():
+    if not config.target_channel:
+        logger.warning("Target channel not set, skipping sites parsing")
+        return
+
+    sem = asyncio.Semaphore(SITES_CONCURRENCY)
+    await asyncio.gather(
+        *(_parse_one_site(site, http_session, sem) for site in list(config.sources["sites"])),
+        return_exceptions=True
+    )
 
 async def parse_channels():
     if not config.target_channel:
@@ -236,10 +628,12 @@ async def parse_channels():
                 clean_content = msg.text or msg.caption or ""
                 # Удаляем гиперссылки из контента
                 clean_content = remove_hyperlinks(clean_content)
-                msg_hash = get_message_hash(clean_content + str(msg.media))
+                hash_text = clean_content + get_media_key(msg.media)
+                msg_hash = get_message_hash(hash_text)
                 
-                if msg_hash not in config.sent_hashes:
-                    if not config.keywords or contains_keywords(clean_content, config.keywords):
+                # Старые MD5-хэши считались от полного str(msg.media)
+                if not config.was_sent(msg_hash, lambda: clean_content + str(msg.media)):
+                    if not config.keywords or contains_keywords(clean_content, config.keywords_pattern):
                         try:
                             if msg.media:
                                 if isinstance(msg.media, MessageMediaPhoto):
@@ -267,8 +661,7 @@ async def parse_channels():
                                     link_preview=False
                                 )
                             
-                            config.sent_hashes.add(msg_hash)
-                            config.save()
+                            config.mark_sent(msg_hash)
                             logger.info(f"Successfully forwarded message from {channel}")
                         except errors.FloodWaitError as e:
                             logger.error(f"Flood wait error: {e}, sleeping for {e.seconds} seconds")
@@ -303,10 +696,12 @@ async def parse_history():
 
                 clean_content = msg.text or msg.caption or ""
                 clean_content = remove_hyperlinks(clean_content)
-                msg_hash = get_message_hash(clean_content + str(msg.media))
+                hash_text = clean_content + get_media_key(msg.media)
+                msg_hash = get_message_hash(hash_text)
 
-                if msg_hash not in config.sent_hashes:
-                    if not config.keywords or contains_keywords(clean_content, config.keywords):
+                # Старые MD5-хэши считались от полного str(msg.media)
+                if not config.was_sent(msg_hash, lambda: clean_content + str(msg.media)):
+                    if not config.keywords or contains_keywords(clean_content, config.keywords_pattern):
                         try:
                             if msg.media:
                                 await userbot.send_file(
@@ -321,8 +716,7 @@ async def parse_history():
                                     link_preview=False
                                 )
 
-                            config.sent_hashes.add(msg_hash)
-                            config.save()
+                            config.mark_sent(msg_hash)
                             logger.info(f"History message forwarded from {channel}")
                         except Exception as e:
                             logger.error(f"Error forwarding history message: {e}")
@@ -374,7 +768,7 @@ async def show_status(callback: types.CallbackQuery):
         f"• Каналов в источниках: {len(config.sources['channels'])}\n"
         f"• Сайтов в источниках: {len(config.sources['sites'])}\n"
         f"• Ключевых слов: {len(config.keywords) or 'не заданы'}\n"
-        f"• Найдено сообщений: {len(config.sent_hashes)}\n"
+        f"• Найдено сообщений: {config.sent_count}\n"
         f"• Парсинг: {'активен' if parsing_active else 'не активен'}"
     )
     await callback.message.edit_text(status_text, parse_mode="HTML", reply_markup=get_main_menu_keyboard())
@@ -486,7 +880,7 @@ async def remove_source_handler(callback: types.CallbackQuery):
     for source in config.sources["channels"] + config.sources["sites"]:
         builder.row(InlineKeyboardButton(
             text=f"❌ Удалить {source[:20]}{'...' if len(source) > 20 else ''}",
-            callback_data=f"remove_{hashlib.md5(source.encode()).hexdigest()}"
+            callback_data=f"remove_{config.source_hash(source)}"
         ))
     
     await callback.message.answer(
@@ -499,17 +893,16 @@ async def confirm_remove_handler(callback: types.CallbackQuery):
     await callback.answer()
     source_hash = callback.data.split("_")[1]
     
-    for source_type in ["channels", "sites"]:
-        for source in config.sources[source_type][:]:
-            if hashlib.md5(source.encode()).hexdigest() == source_hash:
-                config.sources[source_type].remove(source)
-                config.save()
-                await send_message_with_menu(
-                    callback.message.chat.id,
-                    f"✅ Источник {source} удален"
-                )
-                await list_sources_handler(callback)
-                return
+    entry = config.pop_source(source_hash)
+    if entry:
+        _, source = entry
+        await config.save()
+        await send_message_with_menu(
+            callback.message.chat.id,
+            f"✅ Источник {source} удален"
+        )
+        await list_sources_handler(callback)
+        return
     
     await send_message_with_menu(
         callback.message.chat.id,
@@ -585,7 +978,7 @@ async def handle_text(message: types.Message):
                 raise ValueError("Канал не найден")
                 
             config.target_channel = channel
-            config.save()
+            await config.save()
             await send_message_with_menu(
                 message.chat.id,
                 f"✅ Целевой канал установлен: {channel}"
@@ -613,8 +1006,8 @@ async def handle_text(message: types.Message):
                 )
                 return
                 
-            config.sources['sites'].append(source)
-            config.save()
+            config.add_source('sites', source)
+            await config.save()
             await send_message_with_menu(
                 message.chat.id,
                 f"✅ Сайт добавлен: {source}"
@@ -643,8 +1036,8 @@ async def handle_text(message: types.Message):
                 if not entity:
                     raise ValueError("Канал не найден")
                     
-                config.sources['channels'].append(source)
-                config.save()
+                config.add_source('channels', source)
+                await config.save()
                 await send_message_with_menu(
                     message.chat.id,
                     f"✅ Канал добавлен: {source}"
@@ -668,10 +1061,11 @@ async def handle_text(message: types.Message):
         awaiting_source = False
         return
     
-    elif any(word in message.text.lower() for word in ["ключевые слова", "keywords"]):
+    text_lower = message.text.lower()
+    if any(word in text_lower for word in KEYWORDS_TRIGGERS):
         if message.text.strip() == "-":
             config.keywords = []
-            config.save()
+            await config.save()
             await send_message_with_menu(
                 message.chat.id,
                 "✅ Фильтрация по ключевым словам отключена"
@@ -679,7 +1073,7 @@ async def handle_text(message: types.Message):
         else:
             keywords = [kw.strip() for kw in message.text.split(',') if kw.strip()]
             config.keywords = keywords
-            config.save()
+            await config.save()
             await send_message_with_menu(
                 message.chat.id,
                 f"✅ Ключевые слова установлены: {', '.join(keywords)}"
@@ -691,12 +1085,37 @@ async def handle_text(message: types.Message):
         "Используйте кнопки меню для управления ботом"
     )
 
+async def config_flush_loop():
+    while True:
+        await asyncio.sleep(CONFIG_FLUSH_INTERVAL)
+        try:
+            await config.flush()
+        except Exception as e:
+            logger.error(f"Config save error: {e}")
+
+def create_http_session() -> aiohttp.ClientSession:
+    """Общая HTTP-сессия: keep-alive соединения переиспользуются между циклами парсинга"""
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=30),
+        connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=60, ttl_dns_cache=300)
+    )
+
 async def main():
+    global http_session
     await userbot.start()
     logger.info("Userbot started")
-    
-    await dp.start_polling(bot)
-    logger.info("Bot started")
+    http_session = create_http_session()
+
+    flush_task = asyncio.create_task(config_flush_loop(), name="config_flush_loop")
+    try:
+        await dp.start_polling(bot)
+        logger.info("Bot started")
+    finally:
+        flush_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await flush_task
+        await http_session.close()
+        await config.flush()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
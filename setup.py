@@ -0,0 +1,16 @@
+"""Необязательная сборка filters.py (clean_text, contains_keywords) в C-расширение через mypyc:
+
+    pip install mypy
+    python setup.py build_ext --inplace
+
+Собранный filters.*.so лежит рядом с filters.py и импортируется вместо него
+(расширения имеют приоритет при импорте). Без сборки работает обычный модуль.
+"""
+from setuptools import setup
+from mypyc.build import mypycify
+
+setup(
+    name="tg_parser_filters",
+    py_modules=[],
+    ext_modules=mypycify(["filters.py"]),
+)